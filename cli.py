@@ -1,79 +1,183 @@
 import argparse
+import asyncio
 import os
 import sys
 import subprocess
 import pyperclip
 
-# Import everything from your existing qdrant.py file
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from qdrant import *  # This imports all variables and functions
+from qdrant import (
+    client, make_collection, EMBEDDING_CACHE_KEY,
+    format_context, get_context_for_query, aget_context_for_query,
+    multi_collection_search, aiter_collection_search, abatch_collection_search,
+    index_godot_project,
+    collection_names, acollection_names, forget_collection_names, cached_collection_names,
+)
 
-def query_database(text, limit=3, collections=None, include_rules=False, update_project=False):
-    """Query multiple collections and combine the results."""
+RULES_QUERY = "project coding standards rules"
+
+def read_rules_file():
+    """Return the contents of project_rules.md, or None if it doesn't exist."""
+    rules_file_path = os.path.join(os.path.dirname(__file__), "project_rules.md")
+    if os.path.exists(rules_file_path):
+        with open(rules_file_path, 'r') as f:
+            return f.read()
+    return None
+
+def combine_context(text, project_rules, results):
+    """
+    Join the prompt, project rules and per-collection hits into one string.
+    
+    Args:
+        text: The query text
+        project_rules: Rules text, or None to leave the section out
+        results: Collection name -> list of hits (or the search exception)
+    
+    Returns:
+        str: The combined context for the LLM
+    """
     all_context = []
     all_context.append(f"Prompt: {text}")
+    if project_rules is not None:
+        all_context.append("--- PROJECT RULES ---\n\n" + project_rules + "\n")
+    
+    for collection, hits in results.items():
+        if isinstance(hits, Exception):
+            print(f"Error querying collection '{collection}': {hits}")
+        elif hits:
+            all_context.append(f"\n--- CONTEXT FROM {collection.upper()} ---")
+            all_context.append(format_context(hits))
+    
+    return "\n\n".join(all_context)
+
+def collection_results(results):
+    """Drop failed and empty searches, returning [{collection, results}] for the API."""
+    return [
+        {"collection": collection, "results": hits}
+        for collection, hits in results.items()
+        if not isinstance(hits, Exception) and hits
+    ]
+
+def resolve_collections(collections, existing):
+    """Pick the collections to search, dropping requested ones that don't exist."""
+    if collections is None:
+        return sorted(existing)
+    
+    missing = [c for c in collections if c not in existing]
+    if missing:
+        print(f"Skipping missing collections: {missing}")
+    return [c for c in collections if c in existing]
+
+def query_database(text, limit=3, collections=None, include_rules=False, update_project=False):
+    """
+    Query multiple collections and combine the results.
+    
+    Returns:
+        tuple: (combined context, project rules, list of {collection, results})
+    """
     project_rules = None
     if update_project:
         print('Updating Godot project file index')
         index_project()
     if include_rules:
         try:
-            rules_context = None
-            rules_file_path = os.path.join(os.path.dirname(__file__), "project_rules.md")
-            if os.path.exists(rules_file_path):
-                with open(rules_file_path, 'r') as f:
-                    rules_context = f.read()
-            else:
-                rules_context = get_context_for_query("project coding standards rules", 1, "godot_game")
-
-            project_rules = rules_context
-            all_context.append("--- PROJECT RULES ---\n\n" + rules_context + "\n")
-
+            project_rules = read_rules_file()
+            if project_rules is None:
+                project_rules = get_context_for_query(RULES_QUERY, 1, "godot_game")
         except Exception as e:
             print(f"Error retrieving project rules: {e}")
     
     if collections is None:
         try:
-            all_collections = client.get_collections()
-            collections = [c.name for c in all_collections.collections]
+            collections = resolve_collections(None, collection_names())
             print(f"Searching across all collections: {collections}")
         except Exception as e:
             print(f"Error retrieving collections: {e}")
             collections = ["godot_game", "godot_docs"]
+    else:
+        # Explicit names are searched as given, since per-collection failures are reported anyway.
+        # Only filter them when the name cache is already warm, so this costs no extra round-trip.
+        cached_names = cached_collection_names()
+        if cached_names is not None:
+            collections = resolve_collections(collections, cached_names)
     
-    for collection in collections:
-        try:
-            context = get_context_for_query(text, limit, collection)
-            if context.strip():
-                all_context.append(f"\n--- CONTEXT FROM {collection.upper()} ---")
-                all_context.append(context)
-        except Exception as e:
-            print(f"Error querying collection '{collection}': {e}")
+    results = multi_collection_search(text, limit, collections)
+    combined_context = combine_context(text, project_rules, results)
     
-    if all_context:
-        combined_context = "\n\n".join(all_context)
-        print("\n--- CONTEXT FOR LLM ---")
-        print(combined_context)
-        print("\n--- END CONTEXT ---")
-        try:
-            pyperclip.copy(combined_context)
-            print("Context copied to clipboard!")
-        except:
-            print("Could not copy")
-            pass
-        return combined_context, project_rules
-    else:
-        print("No relevant context found in any collection.")
-        return "", ""
+    print("\n--- CONTEXT FOR LLM ---")
+    print(combined_context)
+    print("\n--- END CONTEXT ---")
+    try:
+        pyperclip.copy(combined_context)
+        print("Context copied to clipboard!")
+    except:
+        print("Could not copy")
+        pass
+    return combined_context, project_rules, collection_results(results)
+
+async def aload_project_rules():
+    """Async counterpart of the rules lookup in query_database; returns None on failure."""
+    try:
+        project_rules = read_rules_file()
+        if project_rules is None:
+            project_rules = await aget_context_for_query(RULES_QUERY, 1, "godot_game")
+        return project_rules
+    except Exception as e:
+        print(f"Error retrieving project rules: {e}")
+        return None
+
+async def aprepare_query(collections=None, include_rules=False):
+    """Load the project rules and resolve which collections an API query searches."""
+    # The rules search and the collection listing are independent round-trips
+    rules_task = asyncio.ensure_future(aload_project_rules()) if include_rules else None
+    
+    try:
+        collections = resolve_collections(collections, await acollection_names())
+    except Exception as e:
+        print(f"Error retrieving collections: {e}")
+        collections = collections or ["godot_game", "godot_docs"]
+    
+    project_rules = await rules_task if rules_task else None
+    return project_rules, collections
+
+async def astream_query(text, limit=3, collections=None, include_rules=False):
+    """
+    Stream an API query: a {query, project_rules} header, then one
+    {collection, results} dict per collection as soon as its search finishes.
+    Failed and empty searches are skipped.
+    """
+    project_rules, collections = await aprepare_query(collections, include_rules)
+    yield {"query": text, "project_rules": project_rules}
+    
+    async for collection, hits in aiter_collection_search(text, limit, collections):
+        if isinstance(hits, Exception):
+            print(f"Error querying collection '{collection}': {hits}")
+        elif hits:
+            yield {"collection": collection, "results": hits}
+
+async def abatch_query(texts, limit=3, collections=None):
+    """
+    Answer several API queries with one embedding pass and one search per collection.
+    
+    Returns:
+        list: One {query, contexts} dict per query text
+    """
+    _, collections = await aprepare_query(collections)
+    
+    results = await abatch_collection_search(texts, limit, collections)
+    for text_results in results:
+        for collection, hits in text_results.items():
+            if isinstance(hits, Exception):
+                print(f"Error querying collection '{collection}': {hits}")
+    
+    return [
+        {"query": text, "contexts": collection_results(text_results)}
+        for text, text_results in zip(texts, results)
+    ]
 
 def index_project(path=r"C:\Users\Mitch\Game Dev\Emergency-Hotfix", chunk_size=1000, chunk_overlap=200):
     """Index a Godot project into the vector database."""
-    collections = client.get_collections()
-    collection_names = [c.name for c in collections.collections]
-    
-    if 'godot_game' not in collection_names:
-        print("Collection 'godot_game' doesn't exist. Creating it first...")
-        create_collection('godot_game')
+    ensure_collection('godot_game')
     
     stats = index_godot_project(
         project_path=path,
@@ -85,15 +189,16 @@ def index_project(path=r"C:\Users\Mitch\Game Dev\Emergency-Hotfix", chunk_size=1
 
 def create_collection(name):
     """Create a new vector collection."""
-    client.create_collection(
-        collection_name=name,
-        vectors_config=VectorParams(
-            size=model.get_sentence_embedding_dimension(),
-            distance=Distance.COSINE
-        )
-    )
+    make_collection(client, name)
+    forget_collection_names()
     print(f"Collection '{name}' created successfully!")
 
+def ensure_collection(name):
+    """Create a collection if it doesn't exist yet, with a single lookup RPC."""
+    if not client.collection_exists(name):
+        print(f"Collection '{name}' doesn't exist. Creating it first...")
+        create_collection(name)
+
 def list_collections():
     """List all available collections."""
     collections = client.get_collections()
@@ -109,34 +214,82 @@ def delete_collection(name):
     confirm = input(f"Are you sure you want to delete collection '{name}'? (y/n): ")
     if confirm.lower() == 'y':
         client.delete_collection(collection_name=name)
+        forget_collection_names()
         print(f"Collection '{name}' deleted.")
     else:
         print("Deletion cancelled.")
 
-def index_godot_docs(version="stable", collection_name="godot_docs"):
-    """Clone and index Godot documentation."""
-    # Clone repo (shallow clone to save space/time)
-    docs_path = "godot-docs-temp"
+def git_head(docs_path):
+    """Return the commit SHA checked out in docs_path."""
+    result = subprocess.run(["git", "-C", docs_path, "rev-parse", "HEAD"], capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+def is_docs_repo(docs_path):
+    """True only if docs_path is the root of its own git repo, not a plain directory inside another repo."""
+    if not os.path.isdir(docs_path):
+        return False
+    result = subprocess.run(["git", "-C", docs_path, "rev-parse", "--show-toplevel"], capture_output=True, text=True)
+    if result.returncode != 0:
+        return False
+    toplevel = os.path.normcase(os.path.realpath(result.stdout.strip()))
+    return toplevel == os.path.normcase(os.path.realpath(docs_path))
+
+def ensure_docs_checkout(version, docs_path):
+    """Finish the sparse checkout of classes/ if a clone stopped before it was checked out."""
+    sparse = subprocess.run(["git", "-C", docs_path, "sparse-checkout", "list"], capture_output=True, text=True)
+    if sparse.returncode == 0 and "classes" in sparse.stdout.split() and os.path.isdir(os.path.join(docs_path, "classes")):
+        return
     
-    if os.path.exists(docs_path):
-        print(f"Directory {docs_path} already exists. Updating instead of cloning...")
-        # Update the repo
-        subprocess.run(["git", "-C", docs_path, "pull"])
+    print(f"Checking out classes/ in {docs_path}...")
+    subprocess.run(["git", "-C", docs_path, "sparse-checkout", "init", "--cone"], check=True)
+    subprocess.run(["git", "-C", docs_path, "sparse-checkout", "set", "classes"], check=True)
+    subprocess.run(["git", "-C", docs_path, "checkout", version], check=True)
+
+def fetch_godot_docs(version, docs_path):
+    """Clone or update only the classes/ subtree of the Godot docs repo."""
+    # git -C on a non-repo directory resolves to the enclosing repo, so only update a real docs checkout
+    if is_docs_repo(docs_path):
+        try:
+            # A single ls-remote round-trip tells us whether there is anything to pull
+            remote = subprocess.run(["git", "-C", docs_path, "ls-remote", "--heads", "origin", version],
+                                    capture_output=True, text=True, check=True)
+            remote_sha = remote.stdout.split()[0] if remote.stdout.strip() else None
+            if remote_sha and remote_sha == git_head(docs_path):
+                print(f"Directory {docs_path} is already up to date.")
+            else:
+                print(f"Directory {docs_path} already exists. Updating instead of cloning...")
+                # Update the repo, staying shallow so only the new revision is fetched
+                subprocess.run(["git", "-C", docs_path, "fetch", "--depth", "1", "origin", version], check=True)
+                subprocess.run(["git", "-C", docs_path, "reset", "--hard", "FETCH_HEAD"], check=True)
+        except subprocess.CalledProcessError as e:
+            print(f"Warning: could not update {docs_path} ({e}); using the existing checkout.")
+        # HEAD can match the remote while classes/ was never checked out, e.g. after an interrupted clone
+        ensure_docs_checkout(version, docs_path)
     else:
-        # Directory doesn't exist, so create parent directories if needed
-        os.makedirs(os.path.dirname(docs_path), exist_ok=True)
-        
-        # Clone if doesn't exist
+        # Partial + sparse clone so only the blobs under classes/ are downloaded.
+        # An empty placeholder directory is fine, git clones into it.
         print(f"Cloning Godot docs ({version} branch)...")
-        subprocess.run(["git", "clone", "--depth", "1", "-b", version, 
-                       "https://github.com/godotengine/godot-docs.git", docs_path])
-        
-    collections = client.get_collections()
-    collection_names = [c.name for c in collections.collections]
+        subprocess.run(["git", "clone", "--filter=blob:none", "--no-checkout", "--depth", "1", "-b", version,
+                       "https://github.com/godotengine/godot-docs.git", docs_path], check=True)
+        ensure_docs_checkout(version, docs_path)
+
+def index_godot_docs(version="stable", collection_name="godot_docs"):
+    """Clone and index Godot documentation, skipping revisions already indexed."""
+    docs_path = "godot-docs-temp"
+    fetch_godot_docs(version, docs_path)
+    
+    # The marker records the docs revision and the embedding model that indexed it
+    indexed_marker = f"{git_head(docs_path)} {EMBEDDING_CACHE_KEY}"
+    indexed_sha_path = os.path.join(docs_path, f".indexed_sha_{collection_name}")
+    if (os.path.exists(indexed_sha_path)
+            and client.collection_exists(collection_name)
+            and client.count(collection_name).count > 0):
+        with open(indexed_sha_path, 'r') as f:
+            if f.read().strip() == indexed_marker:
+                print(f"Documentation at {indexed_marker[:8]} is already indexed in '{collection_name}'.")
+                return {"files_processed": 0, "chunks_created": 0, "errors": 0}
     
-    if collection_name not in collection_names:
-        print(f"Collection '{collection_name}' doesn't exist. Creating it first...")
-        create_collection(collection_name)
+    ensure_collection(collection_name)
     
     # Index the documentation (focusing on classes directory for API reference)
     print("Indexing documentation...")
@@ -147,6 +300,10 @@ def index_godot_docs(version="stable", collection_name="godot_docs"):
         file_extensions=[".rst", ".md", ".txt"]
     )
     
+    if stats["errors"] == 0:
+        with open(indexed_sha_path, 'w') as f:
+            f.write(indexed_marker)
+    
     print(f"Indexed {stats['files_processed']} documentation files.")
     return stats
 
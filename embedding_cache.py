@@ -0,0 +1,74 @@
+"""Content-addressed on-disk cache for chunk embeddings."""
+import hashlib
+import os
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+
+CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite")
+
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_BATCH = 500
+
+def text_hash(text, model_name=""):
+    """Return the 16-byte cache key for a chunk; the model name keeps vectors from different models apart."""
+    return hashlib.blake2b(f"{model_name}\0{text}".encode('utf-8'), digest_size=16).digest()
+
+def _connect(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS embeddings (hash BLOB PRIMARY KEY, vec BLOB)")
+    return conn
+
+def get_or_compute(texts, model, model_name="", path=CACHE_PATH, batch_size=64):
+    """
+    Embed texts, reusing vectors cached on disk for unchanged chunks.
+    
+    Args:
+        texts: List of chunk texts to embed
+        model: SentenceTransformer model used for cache misses
+        model_name: Identifies the model in the cache key
+        path: Path of the sqlite cache file
+        batch_size: Batch size for encoding the misses
+        
+    Returns:
+        np.ndarray: float32 array of shape (len(texts), embedding_dim)
+    """
+    if not texts:
+        return np.empty((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    
+    hashes = [text_hash(text, model_name) for text in texts]
+    found = {}
+    
+    with closing(_connect(path)) as conn:
+        unique_hashes = list(dict.fromkeys(hashes))
+        for i in range(0, len(unique_hashes), _LOOKUP_BATCH):
+            batch = unique_hashes[i:i+_LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(f"SELECT hash, vec FROM embeddings WHERE hash IN ({placeholders})", batch)
+            for key, vec in rows:
+                found[key] = np.frombuffer(vec, dtype=np.float16).astype(np.float32)
+        
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        
+        if missing:
+            vecs = model.encode(
+                list(missing.values()),
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+            vecs = vecs.astype(np.float32)
+            # Stored as float16 to halve the cache size; normalized vectors lose nothing that matters for search
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (hash, vec) VALUES (?, ?)",
+                    [(key, vec.astype(np.float16).tobytes()) for key, vec in zip(missing, vecs)]
+                )
+            found.update(zip(missing, vecs))
+    
+    return np.stack([found[key] for key in hashes])
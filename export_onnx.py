@@ -0,0 +1,35 @@
+"""
+One-time export of the embedding model to a dynamically quantized int8 ONNX model.
+
+Requires optimum: pip install optimum[onnxruntime]
+Run `python export_onnx.py`, then set USE_ONNX=1 to embed with onnxruntime.
+"""
+import argparse
+
+from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from transformers import AutoTokenizer
+
+from qdrant import MODEL_NAME, ONNX_MODEL_DIR
+
+def export(output_dir):
+    model_id = f"sentence-transformers/{MODEL_NAME}"
+    
+    print(f"Exporting {model_id} to ONNX...")
+    model = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+    model.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model_id).save_pretrained(output_dir)
+    
+    # Dynamic int8 weights, VNNI kernels on modern x86
+    print("Quantizing to int8...")
+    quantizer = ORTQuantizer.from_pretrained(output_dir)
+    qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=output_dir, quantization_config=qconfig)
+    
+    print(f"Quantized model saved to {output_dir}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export the embedding model to int8 ONNX')
+    parser.add_argument('--output', default=ONNX_MODEL_DIR, help='Output directory')
+    args = parser.parse_args()
+    export(args.output)
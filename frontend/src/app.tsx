@@ -199,19 +199,51 @@ function App() {
     setLoading(prev => ({ ...prev, query: true }));
     
     try {
-      const response = await axios.post(`${API_URL}/query`, {
-        query: queryText,
-        collections: selectedCollections,
-        include_rules: includeRules
+      const response = await fetch(`${API_URL}/query`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          query: queryText,
+          collections: selectedCollections,
+          include_rules: includeRules
+        })
       });
-      // Set results for UI display
-      setQueryResults(response.data);
+      if (!response.ok || !response.body) {
+        throw new Error(`Query failed with status ${response.status}`);
+      }
+      
+      // NDJSON stream: a header line, then one line per collection as its search finishes
+      const result: QueryResponse = { query: queryText, contexts: [] };
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        buffered += decoder.decode(value, { stream: !done });
+        const lines = buffered.split('\n');
+        buffered = done ? '' : (lines.pop() ?? '');
+        
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const item = JSON.parse(line);
+          if ('collection' in item) {
+            result.contexts = [...result.contexts, item as Context];
+          } else {
+            result.query = item.query;
+            result.project_rules = item.project_rules ?? undefined;
+          }
+          // Set results for UI display as they arrive
+          setQueryResults({ ...result });
+        }
+        
+        if (done) break;
+      }
       
-      if (response.data.contexts.length === 0) {
+      if (result.contexts.length === 0) {
         showAlert('No relevant results found. Try a different query.', 'info');
       } else {
         try {
-          const copied = copyResultsToClipboard({...response.data});
+          const copied = copyResultsToClipboard({...result});
           
           if (copied) {
             showAlert('Context copied to clipboard!', 'success');
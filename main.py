@@ -1,20 +1,36 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Dict, Any
 import os
 import tempfile
 import shutil
 from pathlib import Path
 import json
-import re
 import sys
+import asyncio
+import aiofiles
+from contextlib import asynccontextmanager
 # Add parent directory to path to import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from cli import query_database, index_project, index_godot_docs
-from qdrant import client
+from cli import astream_query, abatch_query, index_project, index_godot_docs
+from qdrant import get_model, warmup_model, embed_query, acollection_names, arefresh_collection_names, MAX_QUERY_BATCH
 
-app = FastAPI(title="Godot RAG API")
+@asynccontextmanager
+async def lifespan(app):
+    # Pay model load, first-inference warmup and the Qdrant connection before the first request
+    try:
+        await asyncio.to_thread(lambda: warmup_model(get_model()))
+        await acollection_names()
+    except Exception as e:
+        print(f"Warmup failed: {e}")
+    yield
+
+app = FastAPI(lifespan=lifespan, title="Godot RAG API")
+
+# One index run at a time: a run truncates and refills its collection and writes the embedding cache
+index_lock = asyncio.Lock()
 
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
@@ -34,6 +50,11 @@ class QueryRequest(BaseModel):
     collections: List[str] = ["godot_game", "godot_docs"]
     include_rules: bool = False
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    limit: int = 3
+    collections: List[str] = ["godot_game", "godot_docs"]
+
 class IndexProjectRequest(BaseModel):
     project_path: str
     chunk_size: int = 1000
@@ -52,11 +73,13 @@ class CollectionResults(BaseModel):
     collection: str
     results: List[Result]
 
-class QueryResponse(BaseModel):
+class BatchQueryResult(BaseModel):
     query: str
-    project_rules: Optional[str] = None
     contexts: List[CollectionResults]
 
+class BatchQueryResponse(BaseModel):
+    results: List[BatchQueryResult]
+
 class BaseResponse(BaseModel):
     success: bool
     message: str
@@ -73,76 +96,59 @@ config = {
     'rules_file': None
 }
 
-@app.post("/api/query", response_model=QueryResponse)
+@app.post("/api/query")
 async def api_query(request: QueryRequest):
+    # Embed before streaming starts, so a model failure is still a 500 rather than a truncated 200.
+    # embed_query is memoized, so the searches below reuse this vector.
     try:
-        context, project_rules = query_database(
+        await asyncio.to_thread(embed_query, request.query)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    # NDJSON: a {query, project_rules} line, then one CollectionResults line per collection as its search finishes
+    async def generate_ndjson():
+        async for item in astream_query(
             text=request.query,
             limit=request.limit,
             collections=request.collections,
             include_rules=request.include_rules
+        ):
+            yield json.dumps(item) + "\n"
+    
+    return StreamingResponse(generate_ndjson(), media_type="application/x-ndjson")
+
+@app.post("/api/query/batch", response_model=BatchQueryResponse)
+async def api_query_batch(request: BatchQueryRequest):
+    if len(request.queries) > MAX_QUERY_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_QUERY_BATCH} queries per request")
+    
+    try:
+        results = await abatch_query(
+            texts=request.queries,
+            limit=request.limit,
+            collections=request.collections
         )
-        results = {
-            "query": request.query,
-            "project_rules": project_rules if request.include_rules else None,
-            "contexts": []
-        }
-        current_collection = None
-        collection_results = []
-        
-        collection_pattern = r"--- CONTEXT FROM ([A-Z_]+) ---"
-        collections_sections = re.split(collection_pattern, context)
-        # First item is likely the prompt, skip it
-        if "Prompt:" in collections_sections[0]:
-            collections_sections = collections_sections[1:]
-                
-        for i in range(0, len(collections_sections), 2):
-            if i+1 >= len(collections_sections):
-                break
-                
-            collection_name = collections_sections[i]
-            collection_content = collections_sections[i+1]
-            
-            source_pattern = r"--- From (.*?) ---\n(.*?)(?=\n--- From|\n\(Relevance score:|\Z)"
-            score_pattern = r"\(Relevance score: ([\d.]+)\)"
-            
-            results_list = []
-            
-            source_matches = re.finditer(source_pattern, collection_content, re.DOTALL)
-            
-            for match in source_matches:
-                source = match.group(1)
-                text = match.group(2).strip()
-                
-                score_match = re.search(score_pattern, collection_content)
-                score = float(score_match.group(1)) if score_match else 0.5
-                
-                results_list.append({
-                    "source": source,
-                    "text": text,
-                    "score": score
-                })
-            
-            if results_list:
-                results["contexts"].append({
-                    "collection": collection_name.lower(),
-                    "results": results_list
-                })
         
-        return results
+        return {"results": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/index-project", response_model=IndexResponse)
 async def api_index_project(request: IndexProjectRequest):
+    if index_lock.locked():
+        raise HTTPException(status_code=409, detail="An indexing run is already in progress")
+    
     try:
         config['project_path'] = request.project_path
         
-        stats = index_project(
-            path=request.project_path, 
-            chunk_size=request.chunk_size,
-            chunk_overlap=request.chunk_overlap
-        )
+        # Indexing is blocking and CPU heavy, keep it off the event loop
+        async with index_lock:
+            stats = await asyncio.to_thread(
+                index_project,
+                path=request.project_path, 
+                chunk_size=request.chunk_size,
+                chunk_overlap=request.chunk_overlap
+            )
         
         return {
             "success": True,
@@ -158,15 +164,26 @@ async def api_upload_rules(file: UploadFile = File(...)):
         if not file:
             raise HTTPException(status_code=400, detail="No file provided")
             
-        file_path = UPLOAD_DIR / file.filename
+        file_path = UPLOAD_DIR / Path(file.filename).name
+        # Write to a fresh inode so earlier hard links keep their old contents
+        file_path.unlink(missing_ok=True)
         
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Stream in 1 MiB chunks without blocking the event loop
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(1 << 20):
+                await buffer.write(chunk)
             
         config['rules_file'] = str(file_path)
         
+        # Hard link instead of writing the bytes a second time; copy where links aren't supported
         rules_path = Path("project_rules.md")
-        shutil.copy(file_path, rules_path)
+        tmp_path = Path("project_rules.md.tmp")
+        tmp_path.unlink(missing_ok=True)
+        try:
+            os.link(file_path, tmp_path)
+        except OSError:
+            shutil.copy(file_path, tmp_path)
+        os.replace(tmp_path, rules_path)
         
         return {
             "success": True,
@@ -177,11 +194,16 @@ async def api_upload_rules(file: UploadFile = File(...)):
 
 @app.post("/api/index-docs", response_model=IndexResponse)
 async def api_index_docs(request: IndexDocsRequest):
+    if index_lock.locked():
+        raise HTTPException(status_code=409, detail="An indexing run is already in progress")
+    
     try:
-        stats = index_godot_docs(
-            version=request.version,
-            collection_name=request.collection
-        )
+        async with index_lock:
+            stats = await asyncio.to_thread(
+                index_godot_docs,
+                version=request.version,
+                collection_name=request.collection
+            )
         
         return {
             "success": True,
@@ -194,8 +216,8 @@ async def api_index_docs(request: IndexDocsRequest):
 @app.get("/api/collections", response_model=CollectionsResponse)
 async def api_get_collections():
     try:
-        collections = client.get_collections()
-        collection_names = [c.name for c in collections.collections]
+        # Always ask the server: collections may have been created or deleted from the CLI
+        collection_names = sorted(await arefresh_collection_names())
         
         return {
             "success": True,
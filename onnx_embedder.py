@@ -0,0 +1,67 @@
+"""Int8 ONNX Runtime replacement for the SentenceTransformer encode calls."""
+import os
+
+import numpy as np
+
+class OnnxEmbedder:
+    """
+    Mean-pooled sentence embeddings from an ONNX export of the model.
+    
+    Only implements the parts of the SentenceTransformer API this project
+    uses: encode() and get_sentence_embedding_dimension().
+    """
+    
+    # Preferred execution providers, first available wins
+    PROVIDERS = ("CUDAExecutionProvider", "CPUExecutionProvider")
+    
+    def __init__(self, model_dir, model_file="model_quantized.onnx", max_length=128):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file),
+            providers=[p for p in self.PROVIDERS if p in ort.get_available_providers()]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.max_length = max_length
+        self._dimension = None
+    
+    def get_sentence_embedding_dimension(self):
+        if self._dimension is None:
+            self._dimension = self.encode("dimension probe").shape[0]
+        return self._dimension
+    
+    def encode(self, sentences, batch_size=32, normalize_embeddings=False, **kwargs):
+        """Embed a string or list of strings, returning a float32 numpy array."""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        
+        # Smart batching: similar lengths share a batch, so little compute goes to padding.
+        # SentenceTransformer.encode does the same internally.
+        order = np.argsort([-len(sentence) for sentence in sentences], kind="stable")
+        sorted_sentences = [sentences[i] for i in order]
+        
+        batches = []
+        for i in range(0, len(sorted_sentences), batch_size):
+            encoded = self.tokenizer(
+                sorted_sentences[i:i+batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np"
+            )
+            feeds = {k: v.astype(np.int64) for k, v in encoded.items() if k in self.input_names}
+            token_embeddings = self.session.run(None, feeds)[0]
+            
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            summed = (token_embeddings * mask).sum(axis=1)
+            batches.append(summed / np.clip(mask.sum(axis=1), 1e-9, None))
+        
+        embeddings = np.empty((len(sentences), batches[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.concatenate(batches)
+        if normalize_embeddings:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        
+        return embeddings[0] if single else embeddings
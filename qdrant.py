@@ -1,227 +1,464 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter
-from sentence_transformers import SentenceTransformer 
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, QueryRequest,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType, OptimizersConfigDiff,
+    SearchParams, QuantizationSearchParams, Datatype,
+)
 import os
+import hashlib
+import httpx
 from dotenv import load_dotenv
-import uuid
-import glob
-from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, TYPE_CHECKING
 import time
+import asyncio
+import threading
+from functools import lru_cache
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from embedding_cache import get_or_compute
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+# Keep `from qdrant import *` to the client, config and helpers, not every imported module
+__all__ = [
+    "client", "aclient", "VectorParams", "Distance", "PointStruct",
+    "MODEL_NAME", "ONNX_MODEL_DIR", "EMBEDDING_CACHE_KEY", "QUANTIZATION_CONFIG", "SEARCH_PARAMS", "INDEX_BATCH_SIZE", "ENCODE_BATCH_SIZE",
+    "get_model", "warmup_model", "get_embed_dim", "encode_batch_size", "vector_params", "make_collection",
+    "collection_names", "acollection_names", "arefresh_collection_names", "cached_collection_names", "forget_collection_names",
+    "set_indexing_threshold", "truncate_collection", "point_id", "iter_chunks", "create_chunks", "chunk_file", "iter_project_files",
+    "iter_chunked_files", "process_file", "upload_batch", "wait_for_uploads", "embed_and_upload", "index_godot_project", "index_file",
+    "to_hits", "format_context", "embed_query",
+    "search_collection", "get_context_for_query", "multi_collection_search",
+    "asearch_collection", "aget_context_for_query", "aiter_collection_search",
+    "MAX_QUERY_BATCH", "embed_queries", "abatch_collection_search",
+    "run_godot_index",
+]
 
 load_dotenv()
 
 api_key = os.environ.get("QDRANT_API_KEY")
 endpoint_url = os.environ.get("QDRANT_ENDPOINT") 
 
+# gRPC skips JSON encoding of vectors; set QDRANT_PREFER_GRPC=0 if port 6334 isn't reachable
+prefer_grpc = os.environ.get("QDRANT_PREFER_GRPC", "1") == "1"
+
+# Keep-alive connection pool for the REST transport; the gRPC channel multiplexes on its own
+http_limits = httpx.Limits(max_connections=20, max_keepalive_connections=20)
+
+# One shared client per process, reused by the CLI and every API request
 client = QdrantClient(
     url=endpoint_url,
     api_key=api_key,
+    prefer_grpc=prefer_grpc,
+    limits=http_limits,
+)
+
+# Async client for the FastAPI event loop
+aclient = AsyncQdrantClient(
+    url=endpoint_url,
+    api_key=api_key,
+    prefer_grpc=prefer_grpc,
+    limits=http_limits,
 )
 
-# Initialize embedding model
-model = SentenceTransformer("paraphrase-MiniLM-L3-v2")
+MODEL_NAME = "paraphrase-MiniLM-L3-v2"
+# USE_ONNX=1 embeds with the int8 model written by export_onnx.py instead of PyTorch
+USE_ONNX = os.environ.get("USE_ONNX", "0") == "1"
+ONNX_MODEL_DIR = os.environ.get("ONNX_MODEL_DIR", "onnx-model")
+# The int8 ONNX model's vectors differ slightly from PyTorch's, so they are cached separately
+EMBEDDING_CACHE_KEY = f"{MODEL_NAME}-onnx-int8" if USE_ONNX else MODEL_NAME
+# Intra-op threads for PyTorch on CPU; unset keeps torch's default of one per physical core
+TORCH_NUM_THREADS = int(os.environ.get("TORCH_NUM_THREADS", "0"))
+_model = None
+_model_lock = threading.Lock()
 godot_project_path = r"C:\Users\Mitch\Game Dev\Emergency-Hotfix"
 
+# int8 copies of the vectors stay in RAM for search, the float originals live on disk
+QUANTIZATION_CONFIG = ScalarQuantization(
+    scalar=ScalarQuantizationConfig(
+        type=ScalarType.INT8,
+        quantile=0.99,
+        always_ram=True
+    )
+)
+
+# Search the int8 copies for twice the candidates, then rescore them with the original vectors
+SEARCH_PARAMS = SearchParams(
+    quantization=QuantizationSearchParams(rescore=True, oversampling=2.0)
+)
+
+# Chunks embedded and uploaded together while indexing
+INDEX_BATCH_SIZE = 256
+# Sentences per model forward pass; unset picks 128 on a GPU and 64 on CPU
+ENCODE_BATCH_SIZE = int(os.environ.get("ENCODE_BATCH_SIZE", "0"))
+# Concurrent upload streams, per Qdrant's bulk upload guidance of 2-4
+UPLOAD_STREAMS = 4
+# Qdrant's default, restored once a bulk load finishes
+DEFAULT_INDEXING_THRESHOLD = 20000
+# Threads reading and chunking files ahead of the encoder
+READ_WORKERS = os.cpu_count() or 4
+# Larger files are generated assets or data dumps, not useful context
+MAX_FILE_SIZE = 1024 * 1024
+# Directories pruned from the project walk
+SKIP_DIRS = frozenset({".git", ".import", "addons"})
+# Leading bytes checked for NUL to detect binary files
+BINARY_SNIFF_BYTES = 512
+
+# Seconds a formatted search result stays valid in the result cache
+RESULT_CACHE_TTL = 300
+RESULT_CACHE_SIZE = 1024
+_result_cache = {}
+
+# Seconds the set of existing collection names is trusted before re-listing
+COLLECTION_CACHE_TTL = 60
+_collection_cache = {"fetched_at": 0.0, "names": frozenset()}
+
+def _load_model():
+    if USE_ONNX:
+        from onnx_embedder import OnnxEmbedder
+        return OnnxEmbedder(ONNX_MODEL_DIR)
+    
+    import torch
+    from sentence_transformers import SentenceTransformer
+    
+    if TORCH_NUM_THREADS:
+        torch.set_num_threads(TORCH_NUM_THREADS)
+    
+    # fp16 doubles GPU throughput; on CPU it is slower than fp32, so only use it on CUDA
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = SentenceTransformer(MODEL_NAME, device=device)
+    if device == "cuda":
+        model.half()
+    model.eval()
+    return model
+
+def warmup_model(model):
+    """Run one small batch so a long-running job's first real batch doesn't pay kernel selection and allocator setup."""
+    model.encode(["warmup"] * 8, batch_size=8, show_progress_bar=False)
+
+def get_model():
+    """Load the embedding model on first use, so commands that don't embed start instantly."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = _load_model()
+    return _model
+
+@lru_cache(maxsize=None)
+def get_embed_dim():
+    """Return the embedding dimension, which is fixed for the life of the process."""
+    return get_model().get_sentence_embedding_dimension()
+
+def encode_batch_size(model):
+    """ENCODE_BATCH_SIZE if set, otherwise 128 for a model on CUDA and 64 on CPU."""
+    if ENCODE_BATCH_SIZE:
+        return ENCODE_BATCH_SIZE
+    return 128 if str(getattr(model, "device", "cpu")).startswith("cuda") else 64
+
+def vector_params():
+    """Vector config for new collections: float16 originals on disk, searched through the int8 quantized copies."""
+    return VectorParams(
+        size=get_embed_dim(),
+        distance=Distance.COSINE,
+        on_disk=True,
+        datatype=Datatype.FLOAT16
+    )
+
+def make_collection(client, collection_name):
+    """
+    Create a collection with the project's standard storage layout.
+    
+    Payloads, which hold the chunk text, are kept on disk and read only for
+    the few points a search returns, so RAM goes to the quantized vectors.
+    """
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=vector_params(),
+        quantization_config=QUANTIZATION_CONFIG,
+        on_disk_payload=True
+    )
+
+def _cached_collection_names():
+    if time.time() - _collection_cache["fetched_at"] < COLLECTION_CACHE_TTL:
+        return _collection_cache["names"]
+    return None
+
+def _cache_collection_names(collections):
+    _collection_cache["names"] = frozenset(c.name for c in collections)
+    _collection_cache["fetched_at"] = time.time()
+    return _collection_cache["names"]
+
+def collection_names():
+    """Return the names of existing collections, listing them at most once per COLLECTION_CACHE_TTL."""
+    names = _cached_collection_names()
+    if names is None:
+        names = _cache_collection_names(client.get_collections().collections)
+    return names
+
+async def acollection_names():
+    """Async counterpart of collection_names."""
+    names = _cached_collection_names()
+    if names is None:
+        names = await arefresh_collection_names()
+    return names
+
+async def arefresh_collection_names():
+    """List the collections on the server, bypassing the cache and refreshing it with the result."""
+    return _cache_collection_names((await aclient.get_collections()).collections)
+
+def cached_collection_names():
+    """Return the collection names if listed within COLLECTION_CACHE_TTL, else None, without a round-trip."""
+    return _cached_collection_names()
+
+def forget_collection_names():
+    """Drop the cached collection names after creating or deleting a collection."""
+    _collection_cache["fetched_at"] = 0.0
+
+def set_indexing_threshold(client, collection_name, threshold):
+    """Set a collection's optimizer indexing threshold; 0 disables HNSW indexing during bulk loads."""
+    try:
+        client.update_collection(
+            collection_name=collection_name,
+            optimizers_config=OptimizersConfigDiff(indexing_threshold=threshold)
+        )
+    except Exception as e:
+        print(f"Error updating indexing threshold for {collection_name}: {e}")
+
 def truncate_collection(client, collection_name):
-    """Remove all points from a collection without deleting the collection itself."""
+    """
+    Remove all points from a collection by recreating it empty.
+    
+    Dropping and recreating is constant time on the server, where a match-all
+    delete tombstones every point. The collection comes back with the
+    standard vector and quantization config.
+    """
     try:
-        collections = client.get_collections()
-        collection_names = [c.name for c in collections.collections]
-        
-        if collection_name in collection_names:
-            client.delete(
-                collection_name=collection_name,
-                points_selector=Filter(
-                    must=[],  # Empty filter will match all points
-                )
-            )
+        if client.collection_exists(collection_name):
+            client.delete_collection(collection_name)
+            make_collection(client, collection_name)
             print(f"Truncated collection: {collection_name}")
         else:
             print(f"Collection {collection_name} doesn't exist, nothing to truncate")
     except Exception as e:
         print(f"Error truncating collection {collection_name}: {e}")
 
-def upload_batch_with_retry(client, collection_name, batch_points, max_retries=3, delay=2):
+def point_id(source, chunk_index):
+    """Deterministic 63-bit point ID for a chunk, so re-indexing a file overwrites its points."""
+    digest = hashlib.blake2b(f"{source}|{chunk_index}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') & ((1 << 63) - 1)
+
+def iter_chunks(content, chunk_size, chunk_overlap, min_chunk_size=50):
     """
-    Upload a batch of points to Qdrant with retry logic.
+    Lazily yield overlapping chunks of text content.
     
     Args:
-        client: The Qdrant client
-        collection_name: Name of the collection
-        batch_points: List of points to upload
-        max_retries: Maximum number of retry attempts
-        delay: Seconds to wait between retries
+        content: Text content to split
+        chunk_size: Size of each chunk in characters
+        chunk_overlap: Overlap between chunks in characters
+        min_chunk_size: Minimum size for a valid chunk
         
-    Returns:
-        bool: True if upload was successful, False otherwise
+    Yields:
+        str: Each chunk that is long enough to index
     """
-    for retry in range(max_retries):
-        try:
-            client.upsert(
-                collection_name=collection_name,
-                points=batch_points
-            )
-            print(f"Uploaded batch of {len(batch_points)} chunks")
-            return True
-        except Exception as e:
-            if retry < max_retries - 1:
-                print(f"Upload failed, retrying ({retry+1}/{max_retries})...")
-                time.sleep(delay)
-            else:
-                print(f"Error uploading batch after {max_retries} attempts: {e}")
-                return False
-    return False
+    for start_idx in range(0, len(content), chunk_size - chunk_overlap):
+        chunk = content[start_idx:start_idx + chunk_size]
+        # Skip chunks that are too small. The raw length check spares the strip() on short tails,
+        # and a chunk without whitespace at either end is already its own strip(), so only edge cases copy
+        if len(chunk) > min_chunk_size and (
+            not (chunk[0].isspace() or chunk[-1].isspace()) or len(chunk.strip()) > min_chunk_size
+        ):
+            yield chunk
 
 def create_chunks(content, chunk_size, chunk_overlap, min_chunk_size=50):
+    """Split text content into a list of overlapping chunks; see iter_chunks."""
+    return list(iter_chunks(content, chunk_size, chunk_overlap, min_chunk_size))
+
+def chunk_file(file_path, chunk_size=1000, chunk_overlap=200):
+    """Read a file and split it into chunks. Runs on the indexing thread pool."""
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    
+    # A NUL byte near the start means a binary blob behind a text extension
+    if b'\0' in raw[:BINARY_SNIFF_BYTES]:
+        return []
+    
+    content = raw.decode('utf-8', 'replace')
+    
+    if not content.strip():
+        return []
+    
+    return create_chunks(content, chunk_size, chunk_overlap)
+
+def iter_project_files(project_path, file_extensions, skip_dirs=SKIP_DIRS, max_size=MAX_FILE_SIZE):
     """
-    Split text content into overlapping chunks.
+    Walk project_path with os.scandir, yielding indexable files.
+    
+    Skipped directories are pruned without being entered, and files are
+    filtered by extension and size before anything is opened.
     
     Args:
-        content: Text content to split
+        project_path: Root directory to walk
+        file_extensions: Extensions to index, including the dot
+        skip_dirs: Directory names never descended into
+        max_size: Files larger than this many bytes are skipped, as are empty files
+        
+    Yields:
+        str: Path of each file to index
+    """
+    extensions = set(file_extensions)
+    skip = frozenset(skip_dirs)
+    pending_dirs = [project_path]
+    while pending_dirs:
+        dir_path = pending_dirs.pop()
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in skip:
+                            pending_dirs.append(entry.path)
+                    elif (entry.is_file()
+                          and os.path.splitext(entry.name)[1] in extensions
+                          and 0 < entry.stat().st_size <= max_size):
+                        yield entry.path
+        except OSError as e:
+            # An unreadable directory shouldn't abort the whole run
+            print(f"Skipping {dir_path}: {e}")
+
+def iter_chunked_files(files, chunk_size=1000, chunk_overlap=200, max_workers=READ_WORKERS):
+    """
+    Read and chunk files ahead of the encoder on a thread pool.
+    
+    At most max_workers * 2 files are in flight, so memory stays bounded
+    however large the project is.
+    
+    Args:
+        files: Iterable of file paths
         chunk_size: Size of each chunk in characters
         chunk_overlap: Overlap between chunks in characters
-        min_chunk_size: Minimum size for a valid chunk
+        max_workers: Number of reader threads
         
-    Returns:
-        list: List of text chunks
+    Yields:
+        tuple: (file path, future resolving to the file's chunks), in input order
     """
-    chunks = []
-    for start_idx in range(0, len(content), chunk_size - chunk_overlap):
-        end_idx = min(start_idx + chunk_size, len(content))
-        chunk = content[start_idx:end_idx]
-        if len(chunk.strip()) > min_chunk_size:  # Skip chunks that are too small
-            chunks.append(chunk)
-    return chunks
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = deque()
+        for file_path in files:
+            in_flight.append((file_path, executor.submit(chunk_file, file_path, chunk_size, chunk_overlap)))
+            if len(in_flight) >= max_workers * 2:
+                yield in_flight.popleft()
+        
+        while in_flight:
+            yield in_flight.popleft()
 
-def process_file(file_path, project_path, model, stats, skip_dirs=[".git", ".import", "addons"]):
+def process_file(file_path, project_path, chunks, stats):
     """
-    Process a single file and create points for indexing.
+    Build the point records for a single file's chunks.
     
     Args:
         file_path: Path to the file
         project_path: Root project path for relative references
-        model: SentenceTransformer model
+        chunks: The file's text chunks
         stats: Statistics dictionary
-        skip_dirs: Directories to skip
         
     Returns:
-        tuple: (list of points, updated stats)
+        tuple: (list of (point id, payload) records, updated stats)
     """
-    points = []
-    try:
-        rel_path = os.path.relpath(file_path, project_path)
-        
-        if any(skip_dir in rel_path for skip_dir in skip_dirs):
-            return points, stats
-        
-        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-            content = f.read()
-        
-        if not content.strip():
-            return points, stats
-        
-        chunks = create_chunks(content, 1000, 200)
-        
-        for i, chunk in enumerate(chunks):
-            embedding = model.encode(chunk).tolist()
-            
-            metadata = {
-                "source": rel_path,
-                "text": chunk,
-                "chunk_index": i,
-                "total_chunks": len(chunks),
-                "file_type": os.path.splitext(file_path)[1][1:],  # Extension without dot
-            }
-            
-            # Add point
-            points.append(
-                PointStruct(
-                    id=stats["chunks_created"] + len(points) + 1,  # Numeric ID
-                    vector=embedding,
-                    payload=metadata
-                )
-            )
-        
-        stats["files_processed"] += 1
-        stats["chunks_created"] += len(chunks)
+    records = []
+    if not chunks:
+        return records, stats
+    
+    rel_path = os.path.relpath(file_path, project_path)
+    file_type = os.path.splitext(file_path)[1][1:]  # Extension without dot
+    
+    for i, chunk in enumerate(chunks):
+        metadata = {
+            "source": rel_path,
+            "text": chunk,
+            "chunk_index": i,
+            "total_chunks": len(chunks),
+            "file_type": file_type,
+        }
         
-        if stats["files_processed"] % 10 == 0:
-            print(f"Processed {stats['files_processed']} files...")
-            
-    except Exception as e:
-        print(f"Error processing {file_path}: {e}")
-        stats["errors"] += 1
+        records.append((point_id(rel_path, i), metadata))
+    
+    stats["files_processed"] += 1
+    stats["chunks_created"] += len(chunks)
     
-    return points, stats
+    if stats["files_processed"] % 10 == 0:
+        print(f"Processed {stats['files_processed']} files...")
+    
+    return records, stats
+
+def upload_batch(client, collection_name, points):
+    """Upload one batch of points. Runs on the upload thread pool."""
+    client.upload_points(
+        collection_name=collection_name,
+        points=points,
+        batch_size=INDEX_BATCH_SIZE,
+        max_retries=3
+    )
+    print(f"Uploaded batch of {len(points)} chunks")
+
+def wait_for_uploads(in_flight, stats, keep=0):
+    """Block until at most `keep` uploads are in flight, counting failed ones in stats."""
+    while len(in_flight) > keep:
+        try:
+            in_flight.popleft().result()
+        except Exception as e:
+            print(f"Error uploading batch: {e}")
+            stats["errors"] += 1
+    return stats
 
-def process_file_batch(batch_files, project_path, model, stats, client, collection_name):
+def embed_and_upload(records, model, stats, client, collection_name, uploader, in_flight):
     """
-    Process a batch of files and upload their points.
+    Embed a batch of chunk records in one pass and queue their upload.
+    
+    Uploads run on `uploader` while the caller embeds the next batch; at most
+    UPLOAD_STREAMS of them are kept in flight.
     
     Args:
-        batch_files: List of file paths to process
-        project_path: Root project path
+        records: List of (point id, payload) tuples from process_file
         model: SentenceTransformer model
         stats: Statistics dictionary
         client: Qdrant client
         collection_name: Collection name
+        uploader: ThreadPoolExecutor running the uploads
+        in_flight: Deque of pending upload futures
         
     Returns:
         dict: Updated statistics
     """
-    batch_points = []
-    
-    for file_path in batch_files:
-        file_points, stats = process_file(file_path, project_path, model, stats)
-        batch_points.extend(file_points)
-    
-    if batch_points:
-        success = upload_batch_with_retry(client, collection_name, batch_points)
-        if not success:
-            stats["errors"] += 1
-    
-    return stats
-
-def index_godot_docs(version="stable", collection_name="godot_docs"):
-    """Clone and index Godot documentation."""
-    # Clone repo (shallow clone to save space/time)
-    docs_path = "godot-docs-temp"
-    os.makedirs(docs_path, exist_ok=True)
+    if not records:
+        return stats
     
-    print(f"Cloning Godot docs ({version} branch)...")
-    subprocess.run(["git", "clone", "--depth", "1", "-b", version, 
-                   "https://github.com/godotengine/godot-docs.git", docs_path])
-    
-    truncate_collection(client, collection_name)
-
-    collections = client.get_collections()
-    collection_names = [c.name for c in collections.collections]
-    
-    if collection_name not in collection_names:
-        print(f"Collection '{collection_name}' doesn't exist. Creating it first...")
-        create_collection(collection_name)
-    
-    # Index the documentation (focusing on classes directory for API reference)
-    print("Indexing documentation...")
-    stats = index_godot_project(
-        project_path=os.path.join(docs_path, "classes"),
-        client=client,
-        collection_name=collection_name,
-        file_extensions=[".rst", ".md", ".txt"]
-    )
+    try:
+        embeddings = get_or_compute(
+            [payload["text"] for _, payload in records], model,
+            model_name=EMBEDDING_CACHE_KEY, batch_size=encode_batch_size(model)
+        )
+        # The ids, vectors and payloads are built here and already well formed, so skip pydantic validation
+        points = [
+            PointStruct.construct(id=chunk_id, vector=embedding, payload=payload)
+            for (chunk_id, payload), embedding in zip(records, embeddings.tolist())
+        ]
+    except Exception as e:
+        print(f"Error embedding batch: {e}")
+        stats["errors"] += 1
+        return stats
     
-    print(f"Indexed {stats['files_processed']} documentation files.")
-    return stats
+    in_flight.append(uploader.submit(upload_batch, client, collection_name, points))
+    return wait_for_uploads(in_flight, stats, keep=UPLOAD_STREAMS)
 
 def index_godot_project(
     project_path: str,
     client: QdrantClient,
     collection_name: str = "godot_game",
-    model: SentenceTransformer = None,
+    model: "SentenceTransformer" = None,
     file_extensions: List[str] = [".gd", ".md", ".txt", ".cfg"],
     chunk_size: int = 1000,
-    chunk_overlap: int = 200
+    chunk_overlap: int = 200,
+    truncate: bool = True
 ):
     """
     Index a Godot project directory into a Qdrant vector database.
@@ -234,14 +471,22 @@ def index_godot_project(
         file_extensions: List of file extensions to index
         chunk_size: Size of text chunks in characters
         chunk_overlap: Overlap between chunks in characters
+        truncate: Empty the collection first; False adds to the existing points
     
     Returns:
         dict: Summary of indexing results
     """
+    # Check before truncating, so a mistyped path doesn't leave an emptied collection behind
+    if not os.path.isdir(project_path):
+        print(f"Project path is not a directory: {project_path}")
+        return {"files_processed": 0, "chunks_created": 0, "errors": 1}
+    
     if model is None:
-        model = SentenceTransformer("paraphrase-MiniLM-L3-v2")
+        model = get_model()
+    warmup_model(model)
 
-    truncate_collection(client, collection_name)
+    if truncate:
+        truncate_collection(client, collection_name)
     
     stats = {
         "files_processed": 0,
@@ -251,17 +496,37 @@ def index_godot_project(
     
     print(f"Starting to index Godot project at: {project_path}")
     
-    # Find and process all relevant files
-    for extension in file_extensions:
-        file_pattern = os.path.join(project_path, f"**/*{extension}")
-        files = glob.glob(file_pattern, recursive=True)
-        
-        print(f"Found {len(files)} {extension} files")
+    # Defer HNSW construction until the bulk load is done, then build the graph once
+    set_indexing_threshold(client, collection_name, 0)
+    try:
+        # Discover files lazily so reading and encoding start before the walk finishes,
+        # uploading every INDEX_BATCH_SIZE chunks
+        files = iter_project_files(project_path, file_extensions)
         
-        batch_size = 10
-        for i in range(0, len(files), batch_size):
-            batch_files = files[i:i+batch_size]
-            stats = process_file_batch(batch_files, project_path, model, stats, client, collection_name)
+        pending = []
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=UPLOAD_STREAMS) as uploader:
+            for file_path, future in iter_chunked_files(files, chunk_size, chunk_overlap):
+                try:
+                    chunks = future.result()
+                except Exception as e:
+                    print(f"Error processing {file_path}: {e}")
+                    stats["errors"] += 1
+                    continue
+                
+                records, stats = process_file(file_path, project_path, chunks, stats)
+                pending.extend(records)
+                if len(pending) >= INDEX_BATCH_SIZE:
+                    stats = embed_and_upload(pending, model, stats, client, collection_name, uploader, in_flight)
+                    pending = []
+            
+            stats = embed_and_upload(pending, model, stats, client, collection_name, uploader, in_flight)
+            stats = wait_for_uploads(in_flight, stats)
+    finally:
+        set_indexing_threshold(client, collection_name, DEFAULT_INDEXING_THRESHOLD)
+    
+    # Cached search results may now be stale
+    _result_cache.clear()
     
     print("\nIndexing complete!")
     print(f"Files processed: {stats['files_processed']}")
@@ -270,15 +535,6 @@ def index_godot_project(
     
     return stats
 
-def create_collection():
-    client.recreate_collection(
-        collection_name="godot_game",
-        vectors_config=VectorParams(
-            size=model.get_sentence_embedding_dimension(),
-            distance=Distance.COSINE
-        )
-    )
-
 def index_file(file_path):
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
@@ -287,13 +543,19 @@ def index_file(file_path):
             chunk_size = 1000
             chunks = [content[i:i+chunk_size] for i in range(0, len(content), chunk_size)]
             
+            embeddings = get_model().encode(
+                chunks,
+                batch_size=encode_batch_size(get_model()),
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            ).tolist()
+            
             points = []
-            for i, chunk in enumerate(chunks):
-                embedding = model.encode(chunk).tolist()
-                
+            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
                 points.append(
                     PointStruct(
-                        id=f"{file_path.replace('/', '_')}_{i}",
+                        id=point_id(file_path, i),
                         vector=embedding,
                         payload={
                             "text": chunk,
@@ -313,9 +575,56 @@ def index_file(file_path):
     except Exception as e:
         print(f"Error indexing {file_path}: {e}")
 
-def get_context_for_query(query, limit=3, collection_name="godot_game"):
+def to_hits(points):
+    """Convert scored Qdrant points into plain {source, text, score} dicts."""
+    return [
+        {
+            "source": point.payload.get('source', 'unknown'),
+            "text": point.payload.get('text', 'No text available'),
+            "score": point.score,
+        }
+        for point in points
+    ]
+
+def format_context(hits):
     """
-    Query a collection for relevant context.
+    Format search hits into the context string handed to the LLM.
+    
+    Args:
+        hits: List of {source, text, score} dicts
+    
+    Returns:
+        str: Formatted context from the hits
+    """
+    parts = []
+    for hit in hits:
+        parts.append(f"\n--- From {hit['source']} ---\n")
+        parts.append(hit['text'] + "\n")
+        parts.append(f"(Relevance score: {hit['score']:.4f})\n")
+    
+    return "".join(parts)
+
+@lru_cache(maxsize=1024)
+def embed_query(text):
+    """Embed a query string, memoized so repeated prompts skip the model."""
+    return tuple(get_model().encode(text, normalize_embeddings=True).tolist())
+
+def _cached_hits(cache_key):
+    cached = _result_cache.get(cache_key)
+    if cached and time.time() - cached[0] < RESULT_CACHE_TTL:
+        return cached[1]
+    return None
+
+def _cache_hits(cache_key, hits):
+    if len(_result_cache) >= RESULT_CACHE_SIZE:
+        _result_cache.clear()
+    _result_cache[cache_key] = (time.time(), hits)
+
+def search_collection(query, limit=3, collection_name="godot_game"):
+    """
+    Search a collection and return the hits as plain dicts.
+    
+    Results are cached for RESULT_CACHE_TTL seconds per (query, limit, collection).
     
     Args:
         query: The query text
@@ -323,45 +632,180 @@ def get_context_for_query(query, limit=3, collection_name="godot_game"):
         collection_name: Name of the collection to query
     
     Returns:
-        str: Formatted context from the query results
+        list: {source, text, score} dicts, best match first
     """
-    query_vector = model.encode(query).tolist()
+    cache_key = (query, limit, collection_name)
+    hits = _cached_hits(cache_key)
+    if hits is not None:
+        return hits
     
     search_result = client.query_points(
         collection_name=collection_name,
-        query=query_vector,
-        limit=limit
+        query=list(embed_query(query)),
+        limit=limit,
+        search_params=SEARCH_PARAMS
     ).points
     
-    context = ""
-    for point in search_result:
-        context += f"\n--- From {point.payload.get('source', 'unknown')} ---\n"
-        context += point.payload.get('text', 'No text available') + "\n"
-        context += f"(Relevance score: {point.score:.4f})\n"
+    hits = to_hits(search_result)
+    _cache_hits(cache_key, hits)
+    return hits
+
+def get_context_for_query(query, limit=3, collection_name="godot_game"):
+    """
+    Query a collection for relevant context.
+    
+    Args:
+        query: The query text
+        limit: Maximum number of results to return
+        collection_name: Name of the collection to query
+    
+    Returns:
+        str: Formatted context from the query results
+    """
+    return format_context(search_collection(query, limit, collection_name))
+
+def multi_collection_search(text, limit=3, collections=("godot_game", "godot_docs")):
+    """
+    Search several collections with a single embedding of the query text.
+    
+    The query is embedded once and the per-collection searches run
+    concurrently, so latency is one encode plus the slowest round-trip.
+    
+    Args:
+        text: The query text
+        limit: Maximum number of results per collection
+        collections: Names of the collections to query
+    
+    Returns:
+        dict: Collection name -> list of hits, or the raised exception
+              for collections whose search failed
+    """
+    collections = list(collections)
+    if not collections:
+        return {}
     
-    return context
+    # Warm the embedding cache so the concurrent searches share one encode
+    embed_query(text)
+    
+    def search(collection_name):
+        try:
+            return search_collection(text, limit, collection_name)
+        except Exception as e:
+            return e
+    
+    with ThreadPoolExecutor(max_workers=len(collections)) as executor:
+        results = list(executor.map(search, collections))
+    
+    return dict(zip(collections, results))
   
-def run_godot_index():
-    collections = client.get_collections()
-    collection_names = [c.name for c in collections.collections]
+async def asearch_collection(query, limit=3, collection_name="godot_game"):
+    """Async counterpart of search_collection using the async client."""
+    cache_key = (query, limit, collection_name)
+    hits = _cached_hits(cache_key)
+    if hits is not None:
+        return hits
+    
+    # Encoding is CPU bound, keep it off the event loop
+    query_vector = await asyncio.to_thread(embed_query, query)
+    
+    response = await aclient.query_points(
+        collection_name=collection_name,
+        query=list(query_vector),
+        limit=limit,
+        search_params=SEARCH_PARAMS
+    )
+    
+    hits = to_hits(response.points)
+    _cache_hits(cache_key, hits)
+    return hits
+
+async def aget_context_for_query(query, limit=3, collection_name="godot_game"):
+    """Async counterpart of get_context_for_query."""
+    return format_context(await asearch_collection(query, limit, collection_name))
+
+async def aiter_collection_search(text, limit=3, collections=("godot_game", "godot_docs")):
+    """Yield (collection, hits or exception) as each collection's search finishes."""
+    collections = list(collections)
+    if not collections:
+        return
+    
+    await asyncio.to_thread(embed_query, text)
+    
+    async def search(collection_name):
+        try:
+            return collection_name, await asearch_collection(text, limit, collection_name)
+        except Exception as e:
+            return collection_name, e
+    
+    for next_result in asyncio.as_completed([search(c) for c in collections]):
+        yield await next_result
+
+# Upper bound on queries per batch request, keeps one request's latency bounded
+MAX_QUERY_BATCH = 48
+
+def embed_queries(texts):
+    """Embed several query strings in one model forward pass."""
+    return get_model().encode(
+        list(texts),
+        batch_size=encode_batch_size(get_model()),
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False
+    ).tolist()
+
+async def abatch_collection_search(texts, limit=3, collections=("godot_game", "godot_docs")):
+    """
+    Search several collections for several queries at once.
     
-    if "godot_game" not in collection_names:
+    All queries are embedded in a single encode and each collection gets
+    one batched query request, with the collections searched concurrently.
+    
+    Args:
+        texts: The query texts, at most MAX_QUERY_BATCH
+        limit: Maximum number of results per query and collection
+        collections: Names of the collections to query
+    
+    Returns:
+        list: One dict per query text of collection name -> list of hits,
+              or the raised exception for collections whose search failed
+    """
+    texts = list(texts)
+    collections = list(collections)
+    if len(texts) > MAX_QUERY_BATCH:
+        raise ValueError(f"At most {MAX_QUERY_BATCH} queries per batch, got {len(texts)}")
+    if not texts or not collections:
+        return [{} for _ in texts]
+    
+    vectors = await asyncio.to_thread(embed_queries, texts)
+    requests = [QueryRequest(query=vector, limit=limit, params=SEARCH_PARAMS, with_payload=True) for vector in vectors]
+    
+    async def search(collection_name):
+        responses = await aclient.query_batch_points(collection_name=collection_name, requests=requests)
+        hits = [to_hits(response.points) for response in responses]
+        for text, text_hits in zip(texts, hits):
+            _cache_hits((text, limit, collection_name), text_hits)
+        return hits
+    
+    results = await asyncio.gather(*[search(c) for c in collections], return_exceptions=True)
+    
+    return [
+        {
+            collection: result if isinstance(result, Exception) else result[i]
+            for collection, result in zip(collections, results)
+        }
+        for i in range(len(texts))
+    ]
+
+def run_godot_index():
+    if not client.collection_exists("godot_game"):
         print("Collection 'godot_game' doesn't exist. Creating it...")
-        from qdrant_client.models import VectorParams, Distance
-        
-        client.create_collection(
-            collection_name="godot_game",
-            vectors_config=VectorParams(
-                size=model.get_sentence_embedding_dimension(),
-                distance=Distance.COSINE
-            )
-        )
+        make_collection(client, "godot_game")
     
     index_godot_project(
         project_path=godot_project_path,
         client=client,
         collection_name="godot_game",
-        model=model,
+        model=get_model(),
         file_extensions=[".gd", ".md", ".txt", ".cfg", ".json"],
         chunk_size=1000,
         chunk_overlap=200
@@ -369,12 +813,13 @@ def run_godot_index():
     
     print("\nTesting a query...")
     query = "How do I implement player movement?"
-    query_vector = model.encode(query).tolist()
+    query_vector = list(embed_query(query))
     
     response = client.query_points(
         collection_name="godot_game",
         query=query_vector,
-        limit=3
+        limit=3,
+        search_params=SEARCH_PARAMS
     )
     
     print(f"Found {len(response.points)} relevant documents:")